@@ -5,11 +5,12 @@ Minimal, secure dashboard for Streamlit Cloud deployment
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pymongo
-from pymongo import MongoClient
-import openai
+import pandas as pd
 import json
 import time
 
@@ -21,14 +22,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def get_config_value(key, default=None):
-    """Get configuration value from Streamlit secrets or environment variables"""
+# Detect deployment platform (cheap attribute check, re-evaluated on every script run)
+_IS_CLOUD = hasattr(st, 'secrets')
+
+@st.cache_resource
+def get_secrets():
+    """Snapshot Streamlit secrets once per process (empty when none are configured)"""
     try:
-        # Try Streamlit secrets first (for Streamlit Cloud)
-        if hasattr(st, 'secrets') and key in st.secrets:
-            return st.secrets[key]
-    except:
+        if _IS_CLOUD:
+            return dict(st.secrets)
+    except Exception:
         pass
+    return {}
+
+def get_config_value(key, default=None):
+    """Get configuration value from Streamlit secrets or environment variables"""
+    # Try Streamlit secrets first (for Streamlit Cloud)
+    secrets = get_secrets()
+    if key in secrets:
+        return secrets[key]
     
     # Fall back to environment variables (for other deployments)
     return os.getenv(key, default)
@@ -40,45 +52,120 @@ def check_environment():
         "OPENAI_API_KEY"
     ]
     
-    missing_vars = []
-    for var in required_vars:
-        if not get_config_value(var):
-            missing_vars.append(var)
-    
-    return missing_vars
+    return [var for var in required_vars if not get_config_value(var)]
+
+@st.cache_resource
+def get_mongo_client():
+    """Get a shared MongoDB client (connection pool reused across reruns and sessions)"""
+    from pymongo import MongoClient  # Deferred to keep cold start fast
+    
+    # Small pool and short timeouts keep within Atlas connection limits and fail fast
+    return MongoClient(
+        get_config_value("MONGODB_URI"),
+        maxPoolSize=5,
+        minPoolSize=0,
+        serverSelectionTimeoutMS=3000,
+        socketTimeoutMS=5000,
+        appname="sales-agent-dashboard"
+    )
+
+def get_db():
+    """Get the default database from the shared MongoDB client"""
+    return get_mongo_client().get_default_database()
+
+@st.cache_resource
+def ensure_indexes():
+    """Create the indexes used by dashboard queries (runs once per process)"""
+    db = get_db()
+    # For future status-filtered email queries; the $facet summary cannot use indexes
+    db.emails.create_index([("status", 1), ("_id", -1)])
 
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def get_database_stats():
     """Get basic statistics from MongoDB"""
     try:
-        client = MongoClient(get_config_value("MONGODB_URI"))
-        db = client.get_default_database()
+        db = get_db()
         
         # Get collections info
-        collections = db.list_collection_names()
         stats = {}
         
-        for collection_name in collections:
-            if collection_name in ['leads', 'emails', 'campaigns']:
-                count = db[collection_name].count_documents({})
-                stats[collection_name] = count
+        for collection_name in ['leads', 'emails', 'campaigns']:
+            count = db[collection_name].estimated_document_count()
+            stats[collection_name] = count
         
-        client.close()
         return stats
     except Exception as e:
         st.error(f"Database connection error: {str(e)}")
         return {}
 
+def get_stats_chart_data(stats):
+    """Build the collection count chart data from database statistics"""
+    df = pd.DataFrame({"Count": stats})
+    df.index.name = "Collections"
+    return df
+
+@st.cache_data(ttl=60)
+def get_recent_leads():
+    """Get the most recent leads with only the fields shown on the page"""
+    db = get_db()
+    projection = {"name": 1, "email": 1, "institution": 1, "status": 1, "score": 1}
+    return list(db.leads.find({}, projection).sort("_id", -1).limit(10))
+
+@st.cache_data(ttl=60)
+def get_email_summary():
+    """Get email counts by status and the most recent emails in one round-trip"""
+    db = get_db()
+    pipeline = [{"$facet": {
+        "counts": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+        "recent": [
+            {"$sort": {"_id": -1}},
+            {"$limit": 5},
+            {"$project": {"recipient": 1, "subject": 1, "status": 1}}
+        ]
+    }}]
+    result = next(db.emails.aggregate(pipeline), {"counts": [], "recent": []})
+    status_counts = {row["_id"]: row["n"] for row in result["counts"]}
+    return status_counts, result["recent"]
+
+@st.cache_resource
+def get_http_client():
+    """Get a shared HTTP client (keeps connections alive across checks)"""
+    import httpx  # Deferred to keep cold start fast
+    
+    return httpx.Client(timeout=3)
+
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
 def get_openai_status():
     """Check OpenAI API status"""
     try:
-        openai.api_key = get_config_value("OPENAI_API_KEY")
-        # Simple test to check if API key works
-        response = openai.models.list()
-        return True
+        # Only the status code matters, so skip the SDK and response parsing
+        response = get_http_client().get(
+            "https://api.openai.com/v1/models/gpt-4o-mini",
+            headers={"Authorization": f"Bearer {get_config_value('OPENAI_API_KEY')}"}
+        )
+        return response.status_code == 200
     except Exception as e:
         return False
 
+@st.cache_resource
+def get_executor():
+    """Get a shared thread pool for running independent blocking calls"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard-io")
+
+def run_concurrently(*funcs):
+    """Run independent blocking calls concurrently and return their results in order"""
+    ctx = get_script_run_ctx()
+    
+    def with_script_ctx(func):
+        # Worker threads need the script context to use caches and render elements
+        def wrapper():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return func()
+        return wrapper
+    
+    futures = [get_executor().submit(with_script_ctx(func)) for func in funcs]
+    return [future.result() for future in futures]
+
 def main():
     """Main dashboard application"""
     
@@ -87,14 +174,14 @@ def main():
     st.markdown("### Intelligent Lead Generation & Management Platform")
     
     # Show deployment info
-    deployment_type = "Streamlit Cloud (FREE)" if hasattr(st, 'secrets') else "Custom Deployment"
+    deployment_type = "Streamlit Cloud (FREE)" if _IS_CLOUD else "Custom Deployment"
     st.sidebar.success(f"🚀 Deployed on: {deployment_type}")
     
     # Check environment configuration
     missing_vars = check_environment()
     if missing_vars:
         st.error(f"⚠️ Missing required configuration: {', '.join(missing_vars)}")
-        if hasattr(st, 'secrets'):
+        if _IS_CLOUD:
             st.info("💡 Please add these values to your Streamlit secrets")
         else:
             st.info("💡 Please configure these environment variables")
@@ -105,34 +192,19 @@ def main():
         st.header("🧭 Navigation")
         page = st.selectbox(
             "Select Dashboard",
-            [
-                "📊 Overview",
-                "🎯 Lead Management", 
-                "📧 Email Campaigns",
-                "📈 Analytics",
-                "⚙️ Settings"
-            ]
+            list(PAGES),
+            format_func=lambda key: PAGES[key][0]
         )
     
     # Main content area
-    if page == "📊 Overview":
-        show_overview()
-    elif page == "🎯 Lead Management":
-        show_lead_management()
-    elif page == "📧 Email Campaigns":
-        show_email_campaigns()
-    elif page == "📈 Analytics":
-        show_analytics()
-    elif page == "⚙️ Settings":
-        show_settings()
+    PAGES[page][1]()
 
 def show_overview():
     """Show dashboard overview"""
     st.header("📊 Dashboard Overview")
     
-    # Get real data
-    db_stats = get_database_stats()
-    openai_status = get_openai_status()
+    # Get real data (database and OpenAI checks are independent, so run them together)
+    db_stats, openai_status = run_concurrently(get_database_stats, get_openai_status)
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
@@ -183,11 +255,7 @@ def show_overview():
     st.subheader("📈 Recent Activity")
     
     if db_stats:
-        chart_data = {
-            "Collections": list(db_stats.keys()),
-            "Count": list(db_stats.values())
-        }
-        st.bar_chart(chart_data, x="Collections", y="Count")
+        st.bar_chart(get_stats_chart_data(db_stats))
     else:
         st.info("No data available - connect your database to see metrics")
 
@@ -197,31 +265,25 @@ def show_lead_management():
     
     # Get leads from database
     try:
-        client = MongoClient(get_config_value("MONGODB_URI"))
-        db = client.get_default_database()
-        
         # Get recent leads
-        leads = list(db.leads.find({}).sort("_id", -1).limit(10))
+        leads = get_recent_leads()
         
         if leads:
             st.subheader("📋 Recent Leads")
             
-            for lead in leads:
-                with st.expander(f"🎯 {lead.get('name', 'Unknown')} - {lead.get('email', 'No email')}"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write("**Institution:**", lead.get('institution', 'N/A'))
-                        st.write("**Email:**", lead.get('email', 'N/A'))
-                    
-                    with col2:
-                        st.write("**Status:**", lead.get('status', 'New'))
-                        st.write("**Score:**", lead.get('score', 'N/A'))
+            df = pd.DataFrame(leads, columns=["name", "email", "institution", "status", "score"])
+            df = df.fillna({"name": "Unknown", "email": "N/A", "institution": "N/A", "status": "New", "score": "N/A"})
+            df = df.rename(columns={
+                "name": "Name",
+                "email": "Email",
+                "institution": "Institution",
+                "status": "Status",
+                "score": "Score"
+            })
+            st.dataframe(df, use_container_width=True, hide_index=True)
         else:
             st.info("No leads found. Start processing leads to see them here.")
         
-        client.close()
-        
     except Exception as e:
         st.error(f"Error loading leads: {str(e)}")
 
@@ -231,13 +293,11 @@ def show_email_campaigns():
     
     # Get email statistics
     try:
-        client = MongoClient(get_config_value("MONGODB_URI"))
-        db = client.get_default_database()
-        
-        # Get email stats
-        total_emails = db.emails.count_documents({})
-        sent_emails = db.emails.count_documents({"status": "sent"})
-        failed_emails = db.emails.count_documents({"status": "failed"})
+        # Get email stats and recent emails
+        status_counts, recent_emails = get_email_summary()
+        total_emails = sum(status_counts.values())
+        sent_emails = status_counts.get("sent", 0)
+        failed_emails = status_counts.get("failed", 0)
         
         col1, col2, col3 = st.columns(3)
         
@@ -252,14 +312,11 @@ def show_email_campaigns():
         
         # Recent emails
         st.subheader("📤 Recent Emails")
-        recent_emails = list(db.emails.find({}).sort("_id", -1).limit(5))
         
         for email in recent_emails:
             status_emoji = "✅" if email.get('status') == 'sent' else "❌"
             st.write(f"{status_emoji} **To:** {email.get('recipient', 'N/A')} - **Subject:** {email.get('subject', 'N/A')}")
         
-        client.close()
-        
     except Exception as e:
         st.error(f"Error loading email data: {str(e)}")
 
@@ -269,25 +326,17 @@ def show_analytics():
     
     # Get analytics data
     try:
-        client = MongoClient(get_config_value("MONGODB_URI"))
-        db = client.get_default_database()
-        
         # Daily stats for the last 7 days
         st.subheader("📊 Last 7 Days Activity")
         
         # This is a simplified version - in production you'd have more sophisticated analytics
-        collections_data = {}
-        for collection in ['leads', 'emails', 'campaigns']:
-            count = db[collection].count_documents({})
-            collections_data[collection] = count
+        collections_data = get_database_stats()
         
         if collections_data:
-            st.bar_chart(collections_data)
+            st.bar_chart(get_stats_chart_data(collections_data))
         else:
             st.info("No analytics data available yet.")
         
-        client.close()
-        
     except Exception as e:
         st.error(f"Error loading analytics: {str(e)}")
 
@@ -305,8 +354,10 @@ def show_settings():
         ("TELEGRAM_USER_ID", "Telegram User ID"),
     ]
     
+    present = {var: bool(get_config_value(var)) for var, _ in config_vars}
+    
     for var, name in config_vars:
-        if get_config_value(var):
+        if present[var]:
             st.success(f"✅ {name}: Configured")
         else:
             st.error(f"❌ {name}: Not configured")
@@ -315,7 +366,7 @@ def show_settings():
     st.write(f"**Deployment Time:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     # Detect deployment platform
-    if hasattr(st, 'secrets'):
+    if _IS_CLOUD:
         st.write("**Platform:** Streamlit Cloud (FREE)")
         st.write("**Configuration:** Streamlit Secrets")
     else:
@@ -330,19 +381,35 @@ def show_settings():
     
     if st.button("Test Database Connection"):
         try:
-            client = MongoClient(get_config_value("MONGODB_URI"))
-            db = client.get_default_database()
+            db = get_db()
             collections = db.list_collection_names()
             st.success(f"✅ Database connected! Found {len(collections)} collections.")
-            client.close()
         except Exception as e:
             st.error(f"❌ Database connection failed: {str(e)}")
+        else:
+            # Index creation needs write access, which read-only users may not have
+            try:
+                ensure_indexes()
+                st.success("✅ Database indexes are in place.")
+            except Exception as e:
+                st.warning(f"⚠️ Could not create database indexes: {str(e)}")
     
     if st.button("Test OpenAI API"):
+        # Force a fresh check instead of the cached status
+        get_openai_status.clear()
         if get_openai_status():
             st.success("✅ OpenAI API is working!")
         else:
             st.error("❌ OpenAI API connection failed!")
 
+# Navigation: page key -> (label, render function)
+PAGES = {
+    "overview": ("📊 Overview", show_overview),
+    "leads": ("🎯 Lead Management", show_lead_management),
+    "emails": ("📧 Email Campaigns", show_email_campaigns),
+    "analytics": ("📈 Analytics", show_analytics),
+    "settings": ("⚙️ Settings", show_settings),
+}
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file